@@ -1,44 +1,185 @@
 #!/usr/bin/env python3
 import os
 import sys
-import time
+import json
+import re
+import asyncio
 import argparse
-import random
+import atexit
+import queue
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from contextlib import ExitStack
 from pathlib import Path
-from youtube_mp3_transcriber import download_youtube_audio, transcribe_audio
+from youtube_mp3_transcriber import (build_downloader, download_youtube_audio, set_max_concurrent_requests,
+                                     transcribe_audio, warm_up_client)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
+# Matches the 11-character video ID in watch, youtu.be, shorts, embed and live URLs
+_ID_RE = re.compile(r'(?:v=|youtu\.be/|shorts/|embed/|live/)([A-Za-z0-9_-]{11})')
+
+def positive_int(value):
+    """Argparse type for integers of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
 def parse_arguments():
     """Parse command line arguments."""
-    parser = argparse.ArgumentParser(description='Batch download YouTube videos as MP3 and transcribe them with rate limiting.')
+    parser = argparse.ArgumentParser(description='Batch download YouTube video audio and transcribe it with rate limiting.')
     parser.add_argument('--input-file', required=True, help='File containing YouTube URLs (one per line)')
     parser.add_argument('--output-dir', default='downloads', help='Output directory for downloaded files')
     parser.add_argument('--api-key', help='OpenAI API key')
-    parser.add_argument('--min-delay', type=int, default=30, help='Minimum delay between downloads in seconds')
-    parser.add_argument('--max-delay', type=int, default=120, help='Maximum delay between downloads in seconds')
+    parser.add_argument('--max-per-minute', type=positive_int, default=1, help='Maximum number of downloads started per minute')
+    parser.add_argument('--download-concurrency', type=positive_int, default=2, help='Maximum number of simultaneous downloads')
+    parser.add_argument('--transcribe-concurrency', type=positive_int, default=5, help='Maximum number of simultaneous Whisper requests, counting every chunk of every file')
+    parser.add_argument('--state-file', help='Manifest of processed URLs used to resume a batch (default: <output-dir>/.state.jsonl)')
     parser.add_argument('--skip-transcription', action='store_true', help='Skip transcription step')
     return parser.parse_args()
 
+def video_key(url):
+    """Return the YouTube video ID for a URL, or the URL itself if none is found."""
+    match = _ID_RE.search(url)
+    return match.group(1) if match else url
+
 def read_urls(input_file):
-    """Read URLs from input file."""
+    """Read URLs from input file, dropping repeats of the same video."""
     try:
+        seen = set()
+        urls = []
         with open(input_file, 'r') as f:
-            urls = [line.strip() for line in f if line.strip()]
+            for line in f:
+                url = line.strip()
+                if not url:
+                    continue
+                key = video_key(url)
+                if key not in seen:
+                    seen.add(key)
+                    urls.append(url)
         return urls
     except Exception as e:
-        logger.error(f"Error reading input file: {str(e)}")
+        logger.error("Error reading input file: %s", e)
         sys.exit(1)
 
+def load_state(state_file):
+    """Load the latest manifest record for each video, keyed by video_key()."""
+    records = {}
+    path = Path(state_file)
+    if not path.exists():
+        return records
+    for line in path.read_text(encoding='utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # Ignore a partial line left behind by an interrupted run
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get('url'), str):
+            # Ignore lines that are valid JSON but not manifest records
+            continue
+        records[video_key(record['url'])] = record
+    return records
+
+def append_state(state_file, url, audio_path, transcript_path, status):
+    """Append one record to the manifest as a single O_APPEND write."""
+    record = {'url': url, 'audio_path': audio_path, 'transcript_path': transcript_path, 'status': status}
+    fd = os.open(state_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, (json.dumps(record) + '\n').encode('utf-8'))
+    finally:
+        os.close(fd)
+
+async def process_url(index, total, url, audio_file, args, api_key, limiter, downloaders, transcribe_semaphore):
+    """Download and transcribe a single URL, bounded by the downloader pool and transcription semaphore.
+    
+    When audio_file is given the download from a previous run is reused.
+    """
+    if audio_file:
+        logger.info("Processing URL %d/%d: %s (reusing %s)", index + 1, total, url, audio_file)
+    else:
+        # Take an idle downloader from the pool, which also caps concurrent downloads
+        ydl = await downloaders.get()
+        try:
+            # Wait for a token so downloads start no faster than the configured rate
+            async with limiter:
+                logger.info("Processing URL %d/%d: %s", index + 1, total, url)
+                # Download YouTube audio
+                audio_file = await asyncio.to_thread(download_youtube_audio, url, args.output_dir, ydl)
+        finally:
+            downloaders.put_nowait(ydl)
+        append_state(args.state_file, url, audio_file, None, 'downloaded')
+    
+    # Transcribe audio if not skipped
+    if args.skip_transcription:
+        return audio_file
+    
+    async with transcribe_semaphore:
+        transcript_file = await asyncio.to_thread(transcribe_audio, audio_file, api_key)
+    append_state(args.state_file, url, audio_file, transcript_file, 'ok')
+    logger.info("Transcription saved to: %s", transcript_file)
+    return transcript_file
+
+def _reusable_audio(record):
+    """Return the audio path from a manifest record if the file is still on disk."""
+    audio_path = record and record.get('audio_path')
+    return audio_path if audio_path and os.path.exists(audio_path) else None
+
+async def run_batch(urls, state, args, api_key):
+    """Process all URLs concurrently, downloads and transcriptions limited separately."""
+    from aiolimiter import AsyncLimiter
+    
+    limiter = AsyncLimiter(args.max_per_minute, 60)
+    # Files are admitted by the semaphore below; their chunk uploads share one process-wide
+    # request cap, so the flag bounds API concurrency rather than just the number of files
+    set_max_concurrent_requests(args.transcribe_concurrency)
+    transcribe_semaphore = asyncio.Semaphore(args.transcribe_concurrency)
+    
+    # Connect to the OpenAI API while the first downloads run, so the first
+    # transcription does not pay for DNS and the TLS handshake
+    if urls and not args.skip_transcription:
+        warm_up = asyncio.create_task(asyncio.to_thread(warm_up_client, api_key))
+    else:
+        warm_up = None
+    
+    with ExitStack() as stack:
+        # One YoutubeDL per download slot, reused across URLs to keep connections and cookies
+        downloaders = asyncio.Queue()
+        for _ in range(args.download_concurrency):
+            downloaders.put_nowait(stack.enter_context(build_downloader(args.output_dir)))
+        
+        tasks = [
+            asyncio.create_task(process_url(i, len(urls), url, _reusable_audio(state.get(video_key(url))),
+                                            args, api_key, limiter,
+                                            downloaders, transcribe_semaphore))
+            for i, url in enumerate(urls)
+        ]
+        # Results are in the same order as the input URLs
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    if warm_up:
+        await warm_up
+    
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logger.error("Error processing URL %s: %s", url, result)
+    return results
+
 def main():
     """Main function."""
+    # Configure logging through a queue so download and transcription threads
+    # never block on the stderr lock; a single listener thread does the writing
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    # Attach the QueueHandler directly, without basicConfig, so it keeps no formatter of
+    # its own and the listener's formatter is the only one applied
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(logging.INFO)
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
     args = parse_arguments()
     
     # Check if OpenAI API key is provided
@@ -50,37 +191,21 @@ def main():
     
     # Read URLs from input file
     urls = read_urls(args.input_file)
-    logger.info(f"Found {len(urls)} URLs to process")
+    logger.info("Found %d URLs to process", len(urls))
     
-    # Process each URL with rate limiting
-    for i, url in enumerate(urls):
-        try:
-            logger.info(f"Processing URL {i+1}/{len(urls)}: {url}")
-            
-            # Download YouTube audio
-            mp3_file = download_youtube_audio(url, args.output_dir)
-            
-            # Transcribe audio if not skipped
-            if not args.skip_transcription:
-                transcript_file = transcribe_audio(mp3_file, api_key)
-                logger.info(f"Transcription saved to: {transcript_file}")
-            
-            # Apply rate limiting if not the last URL
-            if i < len(urls) - 1:
-                delay = random.randint(args.min_delay, args.max_delay)
-                logger.info(f"Waiting {delay} seconds before next download...")
-                time.sleep(delay)
-        
-        except Exception as e:
-            logger.error(f"Error processing URL {url}: {str(e)}")
-            logger.info("Continuing with next URL...")
-            # Still apply delay before next attempt
-            if i < len(urls) - 1:
-                delay = random.randint(args.min_delay, args.max_delay)
-                logger.info(f"Waiting {delay} seconds before next download...")
-                time.sleep(delay)
+    # Skip URLs already completed by a previous run
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    args.state_file = args.state_file or os.path.join(args.output_dir, '.state.jsonl')
+    state = load_state(args.state_file)
+    done = {'ok', 'downloaded'} if args.skip_transcription else {'ok'}
+    urls = [url for url in urls if state.get(video_key(url), {}).get('status') not in done]
+    logger.info("%d URLs remaining after checking %s", len(urls), args.state_file)
+    
+    # Process URLs concurrently with rate limiting
+    results = asyncio.run(run_batch(urls, state, args, api_key))
+    failed = sum(1 for result in results if isinstance(result, Exception))
     
-    logger.info("Batch processing completed")
+    logger.info("Batch processing completed: %d succeeded, %d failed", len(urls) - failed, failed)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
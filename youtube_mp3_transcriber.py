@@ -1,127 +1,575 @@
 #!/usr/bin/env python3
+import io
 import os
+import json
+import bisect
+import mmap
+import mimetypes
 import sys
-import time
 import argparse
-import yt_dlp
-from pydub import AudioSegment
-import openai
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 from pathlib import Path
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
-)
+# yt_dlp, pydub, openai, httpx, numpy, silero_vad and tenacity are imported inside the functions that
+# use them, so importing this module (e.g. from the batch driver or tests) stays cheap
 logger = logging.getLogger(__name__)
 
+# Whisper decodes audio in 30-second windows, so chunks of that size map directly onto the model
+CHUNK_LENGTH_MS = 30_000
+MAX_TRANSCRIPTION_WORKERS = 5
+# Whisper requests in flight across every file in the process, however many files run at once
+MAX_CONCURRENT_REQUESTS = 5
+
+# Whisper resamples everything to 16 kHz mono, so uploading more than that only costs bandwidth
+UPLOAD_SAMPLE_RATE = 16000
+UPLOAD_BITRATE = '24k'
+
+# With VAD, a chunk ends at the last pause before the 30-second mark unless that would make it shorter than this
+MIN_VAD_CHUNK_MS = 15_000
+# Gaps shorter than this are not pauses; speech that reaches a window edge and resumes within
+# the tolerance at the start of the next window is one utterance split by the windowing
+MIN_PAUSE_MS = 300
+VAD_EDGE_TOLERANCE_MS = 250
+
+# Clips shorter than this, or single-window clips whose peak is below the threshold, are not sent to the API
+MIN_DURATION_SECONDS = 1.0
+SILENCE_THRESHOLD_DBFS = -50
+
+# transcribe_many packs clips into one request while the total, including separators, stays under this
+BATCH_WINDOW_MS = 25_000
+BATCH_SEPARATOR_MS = 1_000
+
+# OpenAI clients are shared per API key so their connection pool survives between calls
+_client_cache = {}
+_client_lock = threading.Lock()
+
+# Every Whisper upload takes one slot, so per-file chunk pools cannot multiply API concurrency
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# The Silero VAD model is loaded on first use and shared, so loading and inference go through one lock
+_vad = None
+_vad_loaded = False
+_vad_lock = threading.Lock()
+
 def parse_arguments():
     """Parse command line arguments."""
-    parser = argparse.ArgumentParser(description='Download YouTube video as MP3 and transcribe it.')
+    parser = argparse.ArgumentParser(description='Download YouTube video audio and transcribe it.')
     parser.add_argument('url', help='YouTube video URL')
     parser.add_argument('--output-dir', default='downloads', help='Output directory for downloaded files')
     parser.add_argument('--api-key', help='OpenAI API key')
     parser.add_argument('--skip-transcription', action='store_true', help='Skip transcription step')
     return parser.parse_args()
 
-def download_youtube_audio(url, output_dir):
-    """Download YouTube video as MP3."""
+def _find_latest_audio(output_dir, video_id):
+    """Return the most recently modified Opus file for a video ID, or None."""
+    with os.scandir(output_dir) as entries:
+        latest = max(
+            (e for e in entries if e.name.endswith('.opus') and f"[{video_id}]" in e.name),
+            key=lambda e: e.stat().st_mtime,
+            default=None
+        )
+    return latest.path if latest else None
+
+def build_downloader(output_dir):
+    """Create a YoutubeDL instance for audio downloads into output_dir.
+    
+    The instance keeps its connections and cookies between downloads, so reuse it across
+    URLs, but from one thread at a time.
+    """
+    import yt_dlp
+    
+    # Create output directory if it doesn't exist
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    
+    # Configure yt-dlp options with additional parameters to bypass restrictions
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        # Include the video ID so concurrent downloads never share a file name
+        'outtmpl': os.path.join(output_dir, '%(title)s [%(id)s].%(ext)s'),
+        # Extract Opus, which YouTube usually serves already, so this is
+        # normally a remux; other sources are re-encoded at a low bitrate
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'opus',
+            'preferredquality': '24',
+        }],
+        'quiet': False,
+        'no_warnings': False,
+        # Persist cookies so consent and age checks are not repeated for every video
+        'cookiefile': os.path.join(output_dir, '.cookies.txt'),
+        # Download fragmented formats with several connections at once
+        'concurrent_fragment_downloads': 5,
+        # Add options to bypass bot protection
+        'nocheckcertificate': True,
+        'geo_bypass': True,
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android', 'web'],
+                'skip': ['hls', 'dash', 'translated_subs']
+            }
+        },
+        # Add random user agent
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'referer': 'https://www.youtube.com/'
+    }
+    return yt_dlp.YoutubeDL(ydl_opts)
+
+def download_youtube_audio(url, output_dir, ydl=None):
+    """Download YouTube video audio as Opus.
+    
+    Pass a YoutubeDL from build_downloader() to reuse it; otherwise one is created for this call.
+    """
     try:
-        # Create output directory if it doesn't exist
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
-        
-        logger.info(f"Downloading audio from: {url}")
-        
-        # Configure yt-dlp options with additional parameters to bypass restrictions
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'quiet': False,
-            'no_warnings': False,
-            # Add options to bypass bot protection
-            'nocheckcertificate': True,
-            'geo_bypass': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web'],
-                    'skip': ['hls', 'dash', 'translated_subs']
-                }
-            },
-            # Add random user agent
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'referer': 'https://www.youtube.com/'
-        }
+        logger.info("Downloading audio from: %s", url)
         
         # Download the audio
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            video_title = info.get('title', 'video')
-            
-        # Find the actual downloaded file in the output directory
-        # This is more reliable than constructing the filename ourselves
-        downloaded_files = [f for f in os.listdir(output_dir) if f.endswith('.mp3')]
-        if not downloaded_files:
-            raise FileNotFoundError(f"No MP3 files found in {output_dir} after download")
-        
-        # If multiple files exist, try to find the most recently created one
-        if len(downloaded_files) > 1:
-            downloaded_files.sort(key=lambda x: os.path.getmtime(os.path.join(output_dir, x)), reverse=True)
-        
-        mp3_file = os.path.join(output_dir, downloaded_files[0])
+        if ydl is None:
+            with build_downloader(output_dir) as ydl:
+                audio_file = _extract_audio(ydl, url, output_dir)
+        else:
+            audio_file = _extract_audio(ydl, url, output_dir)
         
-        logger.info(f"Download complete: {mp3_file}")
-        return mp3_file
+        logger.info("Download complete: %s", audio_file)
+        return audio_file
     
     except Exception as e:
-        logger.error(f"Error downloading YouTube audio: {str(e)}")
+        logger.error("Error downloading YouTube audio: %s", e)
         raise
 
+def _extract_audio(ydl, url, output_dir):
+    """Download one URL with ydl and return the path of the extracted audio file."""
+    info = ydl.extract_info(url, download=True)
+    
+    # Use the path reported by yt-dlp after post-processing, which is
+    # exact even when other downloads are writing to the same directory
+    requested = info.get('requested_downloads') or [{}]
+    audio_file = requested[0].get('filepath')
+    if not audio_file:
+        audio_file = os.path.splitext(ydl.prepare_filename(info))[0] + '.opus'
+    
+    if not os.path.exists(audio_file):
+        # Fall back to the newest Opus file for this video in the output directory
+        audio_file = _find_latest_audio(output_dir, info.get('id', ''))
+        if not audio_file:
+            raise FileNotFoundError(f"No Opus files found in {output_dir} after download")
+    return audio_file
+
+def _get_client(api_key):
+    """Return a cached OpenAI client for the given API key."""
+    import httpx
+    import openai
+    
+    with _client_lock:
+        client = _client_cache.get(api_key)
+        if client is None:
+            http_client = openai.DefaultHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=16)
+            )
+            client = openai.OpenAI(api_key=api_key, http_client=http_client)
+            _client_cache[api_key] = client
+        return client
+
+def set_max_concurrent_requests(limit):
+    """Change how many Whisper requests may run at once across all transcriptions.
+    
+    Call this before starting any transcriptions.
+    """
+    global _request_slots
+    _request_slots = threading.BoundedSemaphore(limit)
+
+def warm_up_client(api_key):
+    """Open a pooled connection to the OpenAI API ahead of the first transcription."""
+    try:
+        # GET /models is cheap and leaves a TLS connection in the client's pool
+        _get_client(api_key).models.list()
+    except Exception as e:
+        logger.warning("Could not pre-warm OpenAI connection: %s", e)
+
+def _create_transcription(client, upload):
+    """Send one (filename, content, content_type) upload to the Whisper API, retrying on rate limits.
+    
+    Returns the verbose_json response, which carries segment timestamps alongside the text.
+    """
+    import openai
+    from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+    
+    for attempt in Retrying(
+        retry=retry_if_exception_type(openai.RateLimitError),
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(6),
+        reraise=True
+    ):
+        # Hold a slot only while the request runs, not during the retry backoff
+        with attempt, _request_slots:
+            return client.audio.transcriptions.create(
+                model="whisper-1",
+                file=upload,
+                response_format="verbose_json",
+                timestamp_granularities=["segment"]
+            )
+
+def _segments(response, offset=0.0):
+    """Return the response segments as plain dicts, shifted by offset seconds."""
+    return [
+        {'start': segment.start + offset, 'end': segment.end + offset, 'text': segment.text.strip()}
+        for segment in response.segments or []
+    ]
+
+@contextmanager
+def _mapped_upload(audio_file):
+    """Memory-map an audio file as an upload tuple so httpx streams it from the page cache."""
+    filename = os.path.basename(audio_file)
+    # Whisper only recognises Ogg/Opus by the .ogg extension
+    if filename.endswith('.opus'):
+        filename = filename[:-len('.opus')] + '.ogg'
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    with open(audio_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield (filename, mapped, content_type)
+
+def _run_ffmpeg(args):
+    """Run ffmpeg with the given arguments and return its stdout, raising with stderr on failure."""
+    result = subprocess.run(['ffmpeg', '-v', 'error', '-nostdin', *args], capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def _transcribe_chunk_file(client, chunk_file):
+    """Transcribe one chunk file written by the ffmpeg segmenter and return the response."""
+    with _mapped_upload(chunk_file) as upload:
+        return _create_transcription(client, upload)
+
+def _load_vad():
+    """Load the Silero VAD model once, returning (model, get_speech_timestamps) or None if unavailable.
+    
+    Callers must hold _vad_lock.
+    """
+    global _vad, _vad_loaded
+    if not _vad_loaded:
+        _vad_loaded = True
+        # Only the pip-installed silero-vad package is used; it ships its own model weights,
+        # so nothing is fetched or executed from the network
+        try:
+            from silero_vad import get_speech_timestamps, load_silero_vad
+        except ImportError:
+            logger.debug("silero-vad is not installed, using fixed-length chunks")
+            return None
+        try:
+            _vad = (load_silero_vad(), get_speech_timestamps)
+        except Exception as e:
+            logger.warning("Silero VAD unavailable, using fixed-length chunks: %s", e)
+    return _vad
+
+def _find_pauses(windows, sample_rate):
+    """Return (pause midpoints, total samples) from (window_length, speech_timestamps) pairs.
+    
+    Speech timestamps are relative to their window, in samples.
+    """
+    min_pause = MIN_PAUSE_MS * sample_rate // 1000
+    edge = VAD_EDGE_TOLERANCE_MS * sample_rate // 1000
+    pauses = []
+    window_start = 0
+    previous_end = None
+    previous_at_edge = False
+    for window_length, speech in windows:
+        window_end = window_start + window_length
+        for segment in speech:
+            start, end = segment['start'] + window_start, segment['end'] + window_start
+            # Speech cut off by the window edge and picked up again in the next window is not a pause
+            joined = previous_at_edge and start - window_start <= edge
+            if previous_end is not None and not joined and start - previous_end >= min_pause:
+                # Cut in the middle of the silence between consecutive speech segments
+                pauses.append((previous_end + start) // 2)
+            previous_end = end
+            previous_at_edge = window_end - end <= edge
+        window_start = window_end
+    return pauses, window_start
+
+def _vad_cut_times(audio_file):
+    """Return chunk boundaries in seconds snapped to pauses in speech, or None if VAD is unavailable."""
+    with _vad_lock:
+        vad = _load_vad()
+    if vad is None:
+        return None
+    
+    import numpy as np
+    import torch
+    model, get_speech_timestamps = vad
+    # Silero expects 16-bit mono samples at 16 kHz. ffmpeg streams the decoded PCM through a
+    # pipe and VAD runs one window at a time, so only a single window is held in memory
+    window_bytes = CHUNK_LENGTH_MS * UPLOAD_SAMPLE_RATE // 1000 * 2
+    process = subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-nostdin', '-i', audio_file,
+         '-ac', '1', '-ar', str(UPLOAD_SAMPLE_RATE), '-f', 's16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    
+    def windows():
+        while True:
+            pcm = process.stdout.read(window_bytes)
+            if not pcm:
+                return
+            samples = torch.from_numpy(np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2).astype(np.float32) / 32768.0)
+            # The model is stateful, so concurrent transcriptions take turns
+            with _vad_lock:
+                speech = get_speech_timestamps(samples, model, sampling_rate=UPLOAD_SAMPLE_RATE)
+            yield len(samples), speech
+    
+    try:
+        pauses, total_samples = _find_pauses(windows(), UPLOAD_SAMPLE_RATE)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0:
+        logger.warning("Could not decode %s for VAD, using fixed-length chunks", audio_file)
+        return None
+    
+    step = CHUNK_LENGTH_MS * UPLOAD_SAMPLE_RATE // 1000
+    min_step = MIN_VAD_CHUNK_MS * UPLOAD_SAMPLE_RATE // 1000
+    starts = [0]
+    while total_samples - starts[-1] > step:
+        limit = starts[-1] + step
+        i = bisect.bisect_right(pauses, limit) - 1
+        if i >= 0 and pauses[i] >= starts[-1] + min_step:
+            starts.append(pauses[i])
+        else:
+            starts.append(limit)
+    return [start / UPLOAD_SAMPLE_RATE for start in starts[1:]]
+
+def _probe_audio(audio_file):
+    """Read the container header and return (duration in seconds or None, whether it has an audio stream).
+    
+    Empty or unreadable files report no audio stream.
+    """
+    if os.path.getsize(audio_file) == 0:
+        return None, False
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a', '-show_entries', 'stream=index:format=duration',
+         '-of', 'json', audio_file],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        return None, False
+    try:
+        info = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return None, False
+    try:
+        duration = float(info.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    return duration, bool(info.get('streams'))
+
+def _transcribe_single(client, audio_file):
+    """Transcribe a file that fits in one window, uploading it unchanged unless it is silent.
+    
+    Returns (text, segments).
+    """
+    from pydub import AudioSegment
+    
+    # The peak level is a single pass over the samples; empty audio reports -inf
+    audio = AudioSegment.from_file(audio_file)
+    if audio.max_dBFS < SILENCE_THRESHOLD_DBFS:
+        logger.info("Audio is silent, skipping transcription")
+        return "", []
+    
+    logger.info("Starting transcription with Whisper model...")
+    with _mapped_upload(audio_file) as upload:
+        response = _create_transcription(client, upload)
+    return response.text.strip(), _segments(response)
+
+def _transcribe_chunks(client, audio_file):
+    """Split audio into chunks of at most 30 seconds and transcribe them in parallel.
+    
+    Returns (text, segments), with segment times relative to the start of the whole file.
+    """
+    cut_times = _vad_cut_times(audio_file)
+    with tempfile.TemporaryDirectory() as chunk_dir:
+        # A single ffmpeg pass decodes, downmixes, resamples and writes the Opus chunks to disk
+        segment_args = (['-segment_times', ','.join(f"{t:.3f}" for t in cut_times)] if cut_times
+                        else ['-segment_time', str(CHUNK_LENGTH_MS / 1000)])
+        _run_ffmpeg([
+            '-i', audio_file, '-ac', '1', '-ar', str(UPLOAD_SAMPLE_RATE),
+            '-c:a', 'libopus', '-b:a', UPLOAD_BITRATE,
+            '-f', 'segment', *segment_args, '-reset_timestamps', '1',
+            os.path.join(chunk_dir, 'chunk_%04d.ogg')
+        ])
+        chunk_files = sorted(Path(chunk_dir).glob('chunk_*.ogg'))
+        
+        logger.info("Starting transcription of %d chunks with Whisper model...", len(chunk_files))
+        responses = [None] * len(chunk_files)
+        with ThreadPoolExecutor(max_workers=MAX_TRANSCRIPTION_WORKERS) as executor:
+            futures = {
+                executor.submit(_transcribe_chunk_file, client, chunk_file): index
+                for index, chunk_file in enumerate(chunk_files)
+            }
+            for future in as_completed(futures):
+                responses[futures[future]] = future.result()
+    
+    # Shift each chunk's segments by the time at which the chunk starts
+    offsets = [0.0] + cut_times if cut_times else [i * CHUNK_LENGTH_MS / 1000 for i in range(len(responses))]
+    segments = []
+    for response, offset in zip(responses, offsets):
+        segments.extend(_segments(response, offset))
+    return "\n".join(response.text.strip() for response in responses), segments
+
+def _write_transcript(audio_file, text, segments):
+    """Save a transcript and its segment timestamps next to the audio file and return the transcript path."""
+    audio_path = Path(audio_file)
+    transcript_file = audio_path.with_name(f"{audio_path.stem}_transcript.txt")
+    transcript_file.write_bytes(text.encode("utf-8"))
+    segments_file = audio_path.with_name(f"{audio_path.stem}_segments.json")
+    segments_file.write_bytes(json.dumps(segments, ensure_ascii=False).encode("utf-8"))
+    
+    logger.info("Transcription saved to: %s", transcript_file)
+    return str(transcript_file)
+
+def _transcribe_group(client, clips):
+    """Transcribe several short clips in one request, separated by silence.
+    
+    Returns one (text, segments) pair per clip, with segment times relative to the clip.
+    """
+    from pydub import AudioSegment
+    
+    combined = AudioSegment.empty()
+    starts = []
+    boundaries = []
+    for clip in clips:
+        if len(combined):
+            combined += AudioSegment.silent(duration=BATCH_SEPARATOR_MS, frame_rate=clip.frame_rate)
+        starts.append(len(combined) / 1000)
+        combined += clip
+        # Anything before the middle of the following separator belongs to this clip
+        boundaries.append(len(combined) + BATCH_SEPARATOR_MS / 2)
+    
+    combined = combined.set_channels(1).set_frame_rate(UPLOAD_SAMPLE_RATE)
+    buffer = io.BytesIO()
+    combined.export(buffer, format="ogg", codec="libopus", bitrate=UPLOAD_BITRATE)
+    response = _create_transcription(client, ("batch.ogg", buffer.getvalue(), "audio/ogg"))
+    
+    # Use the segment timestamps to split the text back into the original clips
+    clip_segments = [[] for _ in clips]
+    for segment in _segments(response):
+        midpoint_ms = (segment['start'] + segment['end']) * 500
+        index = min(bisect.bisect_right(boundaries, midpoint_ms), len(clips) - 1)
+        # Segments can start inside a separator, so keep times within the clip
+        clip_length = len(clips[index]) / 1000
+        segment['start'] = min(max(0.0, segment['start'] - starts[index]), clip_length)
+        segment['end'] = min(max(0.0, segment['end'] - starts[index]), clip_length)
+        clip_segments[index].append(segment)
+    return [(" ".join(segment['text'] for segment in segments), segments) for segments in clip_segments]
+
+def transcribe_many(audio_files, api_key):
+    """Transcribe several audio files, packing short clips into shared Whisper requests.
+    
+    Clips are grouped in order while their combined length stays under BATCH_WINDOW_MS;
+    longer files, and groups of one, go through transcribe_audio. Empty, sub-second and
+    silent clips get an empty transcript without an upload, as in transcribe_audio.
+    Returns, in the same order as audio_files, each transcript path or the exception
+    that file failed with, so one failure does not lose the other results.
+    """
+    from pydub import AudioSegment
+    
+    transcripts = [None] * len(audio_files)
+    groups = []
+    current, current_ms = [], 0
+    for index, audio_file in enumerate(audio_files):
+        try:
+            duration, has_audio = _probe_audio(audio_file)
+            if has_audio and (duration is None or duration * 1000 > BATCH_WINDOW_MS):
+                # Long files go to the executor on their own, alongside the groups
+                groups.append([(index, audio_file, None)])
+                continue
+            
+            clip = AudioSegment.from_file(audio_file) if has_audio else None
+            if clip is None or len(clip) < MIN_DURATION_SECONDS * 1000 or clip.max_dBFS < SILENCE_THRESHOLD_DBFS:
+                logger.info("No speech to transcribe in %s, skipping", audio_file)
+                transcripts[index] = _write_transcript(audio_file, "", [])
+                continue
+        except Exception as e:
+            logger.error("Error transcribing audio %s: %s", audio_file, e)
+            transcripts[index] = e
+            continue
+        
+        if current and current_ms + BATCH_SEPARATOR_MS + len(clip) > BATCH_WINDOW_MS:
+            groups.append(current)
+            current, current_ms = [], 0
+        current_ms += len(clip) + (BATCH_SEPARATOR_MS if current else 0)
+        current.append((index, audio_file, clip))
+    if current:
+        groups.append(current)
+    
+    logger.info("Transcribing %d files in %d requests...", sum(len(group) for group in groups), len(groups))
+    client = _get_client(api_key)
+    with ThreadPoolExecutor(max_workers=MAX_TRANSCRIPTION_WORKERS) as executor:
+        futures = {}
+        for group in groups:
+            if len(group) == 1:
+                future = executor.submit(transcribe_audio, group[0][1], api_key)
+            else:
+                future = executor.submit(_transcribe_group, client, [clip for _, _, clip in group])
+            futures[future] = group
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                if len(group) == 1:
+                    transcripts[group[0][0]] = future.result()
+                    continue
+                for (index, audio_file, _), (text, segments) in zip(group, future.result()):
+                    transcripts[index] = _write_transcript(audio_file, text, segments)
+            except Exception as e:
+                logger.error("Error transcribing %d file(s): %s", len(group), e)
+                for index, _, _ in group:
+                    if transcripts[index] is None:
+                        transcripts[index] = e
+    return transcripts
+
 def transcribe_audio(audio_file, api_key):
     """Transcribe audio file using OpenAI's Whisper model."""
     try:
-        logger.info(f"Transcribing audio file: {audio_file}")
+        logger.info("Transcribing audio file: %s", audio_file)
         
-        # Set OpenAI API key
-        openai.api_key = api_key
+        # Get file size, only when it will actually be logged
+        if logger.isEnabledFor(logging.INFO):
+            file_size = os.path.getsize(audio_file) / (1024 * 1024)  # in MB
+            logger.info("File size: %.2f MB", file_size)
         
-        # Get file size
-        file_size = os.path.getsize(audio_file) / (1024 * 1024)  # in MB
-        logger.info(f"File size: {file_size:.2f} MB")
+        client = _get_client(api_key)
         
-        # Open the audio file
-        with open(audio_file, "rb") as file:
-            # Use the Whisper model to transcribe
-            logger.info("Starting transcription with Whisper model...")
-            client = openai.OpenAI(api_key=api_key)
-            response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=file,
-                response_format="text"
-            )
+        # Read the duration from the header so degenerate and short files are handled without decoding
+        duration, has_audio = _probe_audio(audio_file)
+        if not has_audio:
+            logger.info("No readable audio stream in %s, skipping transcription", audio_file)
+            text, segments = "", []
+        elif duration is not None and duration < MIN_DURATION_SECONDS:
+            logger.info("Audio is only %.2f seconds long, skipping transcription", duration)
+            text, segments = "", []
+        elif duration is not None and duration * 1000 <= CHUNK_LENGTH_MS:
+            text, segments = _transcribe_single(client, audio_file)
+        else:
+            text, segments = _transcribe_chunks(client, audio_file)
         
         # Save transcription to file
-        base_name = os.path.splitext(audio_file)[0]
-        transcript_file = f"{base_name}_transcript.txt"
-        
-        with open(transcript_file, "w", encoding="utf-8") as f:
-            f.write(response)
-        
-        logger.info(f"Transcription saved to: {transcript_file}")
-        return transcript_file
+        return _write_transcript(audio_file, text, segments)
     
     except Exception as e:
-        logger.error(f"Error transcribing audio: {str(e)}")
+        logger.error("Error transcribing audio: %s", e)
         raise
 
 def main():
     """Main function."""
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()]
+    )
+    
     args = parse_arguments()
     
     # Check if OpenAI API key is provided
@@ -131,19 +579,23 @@ def main():
                     "Provide it with --api-key or set OPENAI_API_KEY environment variable.")
         sys.exit(1)
     
+    # Connect to the OpenAI API in the background while the download runs
+    if not args.skip_transcription:
+        threading.Thread(target=warm_up_client, args=(api_key,), daemon=True).start()
+    
     try:
         # Download YouTube audio
-        mp3_file = download_youtube_audio(args.url, args.output_dir)
+        audio_file = download_youtube_audio(args.url, args.output_dir)
         
         # Transcribe audio if not skipped
         if not args.skip_transcription:
-            transcript_file = transcribe_audio(mp3_file, api_key)
-            logger.info(f"Process completed successfully. Transcript saved to: {transcript_file}")
+            transcript_file = transcribe_audio(audio_file, api_key)
+            logger.info("Process completed successfully. Transcript saved to: %s", transcript_file)
         else:
-            logger.info(f"Process completed successfully. Audio saved to: {mp3_file}")
+            logger.info("Process completed successfully. Audio saved to: %s", audio_file)
     
     except Exception as e:
-        logger.error(f"An error occurred: {str(e)}")
+        logger.error("An error occurred: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":